@@ -1,11 +1,15 @@
 import pandas as pd
 import requests
 import os
+import shutil
 import time
+import random
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 import sys
-from typing import Optional, List
-from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterable, Optional, List, Literal, get_args
+from dataclasses import dataclass, fields
 from datetime import datetime
 from dotenv import load_dotenv
 from rich.console import Console
@@ -14,13 +18,22 @@ from rich.progress import Progress, SpinnerColumn, TimeElapsedColumn
 from rich.traceback import install
 from rich.table import Table
 from pathlib import Path
-import json
+import orjson
+import csv
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import aiohttp
-from threading import Lock
+import yarl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import uvloop
+except ImportError:  # Optional, and not available on Windows
+    uvloop = None
 
 # Install rich traceback handler
-install(show_locals=True)
+install(show_locals=False)
 
 # Load environment variables
 load_dotenv()
@@ -38,7 +51,33 @@ logging.basicConfig(
 
 log = logging.getLogger("manychat_extractor")
 
-@dataclass
+OutputFormat = Literal['csv', 'parquet', 'feather']
+OUTPUT_FORMATS = get_args(OutputFormat)
+
+def infer_output_format(output_file: str) -> OutputFormat:
+    """Pick the output format from the file suffix"""
+    suffix = Path(output_file).suffix.lower().lstrip('.')
+    if suffix not in OUTPUT_FORMATS:
+        raise ValueError(f"Output file must end in .csv, .parquet or .feather: {output_file}")
+    return suffix
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before a retry, honoring a numeric Retry-After header"""
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        delay = 2 ** attempt
+    return delay + random.random()
+
+def read_output_file(output_file: str, output_format: OutputFormat, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a previous output file in the given format"""
+    if output_format == 'parquet':
+        return pd.read_parquet(output_file, columns=columns)
+    if output_format == 'feather':
+        return pd.read_feather(output_file, columns=columns)
+    return pd.read_csv(output_file, usecols=columns)
+
+@dataclass(slots=True)
 class ManyChatData:
     email: str
     manychat_id: Optional[str] = None
@@ -47,7 +86,26 @@ class ManyChatData:
     processed_at: Optional[str] = None
 
     def to_dict(self):
-        return asdict(self)
+        # Built by hand: asdict deep-copies and introspects on every row
+        return {
+            'email': self.email,
+            'manychat_id': self.manychat_id,
+            'shopify_domain': self.shopify_domain,
+            'telephone': self.telephone,
+            'processed_at': self.processed_at
+        }
+
+def build_manychat_data(email: str, result_data: Dict[str, Any], processed_at: str) -> ManyChatData:
+    """Build a record from the subscriber object of a successful response"""
+    custom_fields = {field['name']: field['value'] for field in result_data.get('custom_fields', [])}
+    
+    return ManyChatData(
+        email=email,
+        manychat_id=result_data.get('id'),
+        shopify_domain=custom_fields.get('shopify_domain'),
+        telephone=custom_fields.get('telephone'),
+        processed_at=processed_at
+    )
 
 class ExtractorStats:
     def __init__(self):
@@ -91,37 +149,191 @@ class ExtractorStats:
             
             console.print(error_table)
 
-class RateLimiter:
-    def __init__(self, max_requests: int, time_window: float):
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = []
-        self.lock = Lock()
+class CsvResultWriter:
+    """Appends result rows to a CSV file"""
 
-    def acquire(self):
-        with self.lock:
-            now = time.time()
-            
-            # Remove old requests
-            self.requests = [req_time for req_time in self.requests 
-                           if now - req_time <= self.time_window]
-            
-            if len(self.requests) >= self.max_requests:
-                sleep_time = self.requests[0] + self.time_window - now
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-                self.requests = self.requests[1:]
-            
-            self.requests.append(now)
+    # Flushed rows can be read back even if the process is killed later
+    readable_after_flush = True
+
+    def __init__(self, output_file: str, fieldnames: List[str], append: bool):
+        has_rows = append and os.path.exists(output_file) and os.path.getsize(output_file) > 0
+        self.fp = open(output_file, 'a' if append else 'w', newline='', buffering=1 << 20)
+        self.writer = csv.DictWriter(self.fp, fieldnames=fieldnames)
+        if not has_rows:
+            self.writer.writeheader()
+
+    def write(self, row: dict):
+        self.writer.writerow(row)
+
+    def flush(self):
+        self.fp.flush()
+
+    def close(self):
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        self.fp.close()
+
+class ArrowResultWriter:
+    """Writes result rows to a Parquet or Feather file in large row groups
+
+    Rows go to a temporary `<output>.partial` file that replaces the output
+    when the writer is closed. Columnar files cannot be appended to, so a
+    resumed run first copies the previous output into the new file, batch by
+    batch; resuming therefore costs one pass over the existing output.
+    """
+
+    # Nothing is readable until close() writes the footer and replaces the output
+    readable_after_flush = False
+
+    def __init__(self, output_file: str, fieldnames: List[str], append: bool, output_format: OutputFormat,
+                 row_group_size: int = 65_536):
+        self.output_file = output_file
+        self.partial_file = f"{output_file}.partial"
+        self.schema = pa.schema([(name, pa.string()) for name in fieldnames])
+        self.row_group_size = row_group_size
+        self.rows = []
+
+        if output_format == 'parquet':
+            self.writer = pq.ParquetWriter(self.partial_file, self.schema, compression='zstd')
+        else:
+            options = pa.ipc.IpcWriteOptions(compression='lz4')
+            self.writer = pa.ipc.new_file(self.partial_file, self.schema, options=options)
+
+        # Carry previous rows over without loading the whole file at once
+        if append and os.path.exists(output_file):
+            if output_format == 'parquet':
+                batches = pq.ParquetFile(output_file).iter_batches(batch_size=row_group_size, columns=fieldnames)
+            else:
+                reader = pa.ipc.open_file(pa.memory_map(output_file))
+                batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+            group, group_rows = [], 0
+            for batch in batches:
+                group.append(batch)
+                group_rows += batch.num_rows
+                if group_rows >= row_group_size:
+                    self.write_group(group)
+                    group, group_rows = [], 0
+            if group:
+                self.write_group(group)
+
+    def write_group(self, batches: List[pa.RecordBatch]):
+        table = pa.Table.from_batches(batches).select(self.schema.names).cast(self.schema)
+        self.writer.write_table(table.combine_chunks())
+
+    def write(self, row: dict):
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self.writer.write_table(pa.Table.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+
+    def flush(self):
+        # Row groups are sized by row_group_size rather than by how often callers flush
+        pass
+
+    def close(self):
+        if self.rows:
+            self.writer.write_table(pa.Table.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+        self.writer.close()
+        os.replace(self.partial_file, self.output_file)
+
+class CheckpointedResultWriter:
+    """Pairs a result writer with a `.done` file listing the emails it has saved
+
+    Emails are checkpointed only once their rows can be read back: on every
+    flush for CSV, and only on close for Parquet and Feather. Columnar output
+    replaces the previous file on close, so its checkpoint is built in
+    `<output>.done.partial` and replaces the old `.done` right after it; until
+    then the previous output and checkpoint stay a matching pair.
+    """
+
+    def __init__(self, writer, done_file: str, append: bool, seed: Iterable[str] = ()):
+        self.writer = writer
+        self.done_file = done_file
+        self.checkpoint_file = done_file if writer.readable_after_flush else f"{done_file}.partial"
+        if append and self.checkpoint_file != done_file:
+            shutil.copyfile(done_file, self.checkpoint_file)
+        self.done_fp = open(self.checkpoint_file, 'a' if append else 'w', buffering=1 << 20)
+        # Seeded emails are already in the existing output, so record them right away
+        self.pending = list(seed)
+        self.checkpoint()
+
+    def write(self, row: dict):
+        self.writer.write(row)
+        self.pending.append(row['email'])
+
+    def flush(self):
+        self.writer.flush()
+        if self.writer.readable_after_flush:
+            self.checkpoint()
+
+    def checkpoint(self):
+        if self.pending:
+            self.done_fp.write('\n'.join(self.pending) + '\n')
+            self.pending = []
+        self.done_fp.flush()
+
+    def close(self):
+        # Rows reach the output before their emails are checkpointed
+        self.writer.close()
+        self.checkpoint()
+        os.fsync(self.done_fp.fileno())
+        self.done_fp.close()
+        if self.checkpoint_file != self.done_file:
+            os.replace(self.checkpoint_file, self.done_file)
+
+def open_result_writer(output_file: str, output_format: OutputFormat, append: bool):
+    """Open an incremental writer for the given output format"""
+    fieldnames = [field.name for field in fields(ManyChatData)]
+    if output_format == 'csv':
+        return CsvResultWriter(output_file, fieldnames, append)
+    return ArrowResultWriter(output_file, fieldnames, append, output_format)
+
+class AsyncRateLimiter:
+    """Token bucket allowing `rate` requests every `per` seconds"""
+
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def reset(self):
+        """Start a fresh bucket, e.g. before running on a new event loop"""
+        # An asyncio.Lock binds to the first loop it waits on, so each run needs its own
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+            self.updated = now
+
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+                self.tokens = 0
+                self.updated = time.monotonic()
+            else:
+                self.tokens -= 1
 
 class ManyChatExtractor:
+    # Extractor whose file logging is attached to the module logger, if any
+    logging_owner = None
+
     def __init__(self, api_token: str):
         self.api_token = api_token
         self.api_url = 'https://api.manychat.com/fb/subscriber/findBySystemField'
-        self.results = []
+        self.base_url = yarl.URL(self.api_url)
         self.stats = ExtractorStats()
-        self.rate_limiter = RateLimiter(max_requests=10, time_window=1.0)
-        self.results_lock = Lock()
+        self.rate_limiter = AsyncRateLimiter(rate=10, per=1.0)
+        self.max_retries = 6
+        self.seen_errors = set()
+        self.now_iso = datetime.now().isoformat()
+        self.session: Optional[aiohttp.ClientSession] = None
         
         # Setup logging directory
         self.log_dir = Path('logs')
@@ -134,140 +346,267 @@ class ManyChatExtractor:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         log_file = self.log_dir / f'extraction_{timestamp}.log'
         
-        file_handler = logging.FileHandler(log_file)
+        file_handler = logging.FileHandler(log_file, delay=True)
         file_handler.setLevel(logging.DEBUG)
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         file_handler.setFormatter(formatter)
-        log.addHandler(file_handler)
+        
+        # Write the log file from a background thread so coroutines only pay
+        # for a queue put; terminal output still reaches Rich via the root logger
+        log_queue = queue.SimpleQueue()
+        self.file_handler = file_handler
+        self.queue_handler = QueueHandler(log_queue)
+        self.log_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        self.logging_active = False
+        self.start_logging()
         
         log.info(f"Logging to file: {log_file}")
 
+    def start_logging(self):
+        if self.logging_active:
+            return
+        if ManyChatExtractor.logging_owner is not None:
+            raise RuntimeError("Another ManyChatExtractor is already logging; call its stop_logging() first")
+        log.addHandler(self.queue_handler)
+        self.log_listener.start()
+        self.logging_active = True
+        ManyChatExtractor.logging_owner = self
+
+    def stop_logging(self):
+        """Drain queued records and detach this extractor's handlers from the logger"""
+        if not self.logging_active:
+            return
+        log.removeHandler(self.queue_handler)
+        self.log_listener.stop()
+        self.file_handler.close()
+        self.logging_active = False
+        ManyChatExtractor.logging_owner = None
+
+    def create_session(self) -> aiohttp.ClientSession:
+        """Create a keep-alive HTTP session sized to the API rate limit"""
+        connector = aiohttp.TCPConnector(
+            limit=20,
+            limit_per_host=20,
+            ttl_dns_cache=300,
+            keepalive_timeout=30
+        )
+        headers = {
+            'Authorization': f'Bearer {self.api_token}',
+            'Content-Type': 'application/json'
+        }
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=30),
+            # aiohttp expects a str-returning serializer, orjson returns bytes
+            json_serialize=lambda obj: orjson.dumps(obj).decode()
+        )
+
+    async def __aenter__(self):
+        if self.session is None or self.session.closed:
+            self.session = self.create_session()
+            self.rate_limiter.reset()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def tick_clock(self):
+        """Cache the current time so rows don't each format their own timestamp"""
+        while True:
+            self.now_iso = datetime.now().isoformat()
+            await asyncio.sleep(1.0)
+
     async def fetch_manychat_data_async(self, session: aiohttp.ClientSession, email: str) -> Optional[ManyChatData]:
-        try:
-            self.rate_limiter.acquire()
-            
-            log.info(f"🔍 Fetching data for email: {email}")
+        """Fetch one subscriber, returning None when ManyChat has no match"""
+        url = self.base_url.with_query(email=email)
+        
+        for attempt in range(self.max_retries):
+            await self.rate_limiter.acquire()
             
-            headers = {
-                'Authorization': f'Bearer {self.api_token}',
-                'Content-Type': 'application/json'
-            }
-            params = {'email': email}
+            log.debug("🔍 Fetching data for email: %s", email)
             
-            async with session.get(self.api_url, headers=headers, params=params) as response:
-                if response.status == 429:  # Rate limit exceeded
-                    log.warning("Rate limit reached. Cooling down for 10 seconds...")
-                    self.stats.rate_limited += 1
-                    await asyncio.sleep(10)
-                    return await self.fetch_manychat_data_async(session, email)
-                
-                response.raise_for_status()
-                data = await response.json()
-                
-                if data.get('status') == 'success':
-                    result_data = data.get('data', {})
-                    custom_fields = result_data.get('custom_fields', [])
-                    
-                    manychat_data = ManyChatData(
-                        email=email,
-                        manychat_id=result_data.get('id'),
-                        shopify_domain=next((field['value'] for field in custom_fields 
-                                           if field['name'] == 'shopify_domain'), None),
-                        telephone=next((field['value'] for field in custom_fields 
-                                             if field['name'] == 'telephone'), None),
-                        processed_at=datetime.now().isoformat()
-                    )
+            try:
+                async with session.get(url) as response:
+                    if response.status != 429:
+                        response.raise_for_status()
+                        data = await response.json(loads=orjson.loads, content_type=None)
+                        break
                     
-                    log.info(f"Retrieved data for {email}: {json.dumps(manychat_data.to_dict(), indent=2)}")
-                    with self.results_lock:
-                        self.stats.successful += 1
-                    return manychat_data
-                
-                log.warning(f"No data found for email: {email}")
-                with self.results_lock:
-                    self.stats.empty_responses += 1
-                return ManyChatData(email=email, processed_at=datetime.now().isoformat())
-                
-        except Exception as e:
-            log.error(f"❌ Error fetching data for {email}: {str(e)}", exc_info=True)
-            with self.results_lock:
-                self.stats.failed += 1
-                self.stats.errors.append((email, str(e)))
-            return ManyChatData(email=email, processed_at=datetime.now().isoformat())
-
-    async def process_batch_async(self, session: aiohttp.ClientSession, emails: List[str]) -> List[ManyChatData]:
-        tasks = [self.fetch_manychat_data_async(session, email) for email in emails]
-        return await asyncio.gather(*tasks)
-
-    def save_progress(self, data: List[ManyChatData], output_file: str):
-        """Save current progress to CSV file"""
-        df = pd.DataFrame([d.to_dict() for d in data])
-        df.to_csv(output_file, index=False)
-        log.info(f"Progress saved to {output_file}")
-    
-    async def process_csv_async(self, input_file: str, output_file: str = None, resume: bool = False):
+                    # Rate limit exceeded
+                    self.stats.rate_limited += 1
+                    retry_after = response.headers.get('Retry-After')
+                    reason = "Rate limit reached"
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                retry_after = None
+                reason = f"Network error for {email}: {e!r}"
+            
+            if attempt < self.max_retries - 1:
+                delay = retry_delay(attempt, retry_after)
+                log.warning(f"{reason}. Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+        else:
+            raise RuntimeError(f"Still rate limited after {self.max_retries} attempts")
+        
+        if data.get('status') == 'success':
+            manychat_data = build_manychat_data(email, data.get('data', {}), self.now_iso)
+            
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Retrieved data for %s: %s", email, orjson.dumps(manychat_data.to_dict()).decode())
+            return manychat_data
+        
+        log.warning(f"No data found for email: {email}")
+        return None
+
+    async def process_csv_async(self, input_file: str, output_file: str = None, resume: bool = False,
+                                output_format: Optional[OutputFormat] = None):
+        # Open a session for this run unless the caller already shares one
+        if self.session is None:
+            async with self:
+                return await self.process_csv_async(input_file, output_file, resume, output_format)
+
         self.stats.start_time = datetime.now()
         log.info(f"Starting extraction process at {self.stats.start_time}")
         
+        # Refresh the shared processed_at timestamp once a second
+        clock_task = asyncio.create_task(self.tick_clock())
+        
+        writer = None
         try:
             # Generate output filename if not provided
             if output_file is None:
+                output_format = output_format or 'parquet'
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                output_file = f'manychat_data_{timestamp}.csv'
+                output_file = f'manychat_data_{timestamp}.{output_format}'
+            elif output_format is None:
+                output_format = infer_output_format(output_file)
 
             # Create output directory if it doesn't exist
             output_dir = os.path.dirname(output_file)
             if output_dir:
                 os.makedirs(output_dir, exist_ok=True)
 
-            # Read input CSV
+            # Check the input header before streaming it
             log.info(f"Reading input file: {input_file}")
-            input_df = pd.read_csv(input_file)
-            
-            if 'email' not in input_df.columns:
+            if 'email' not in pd.read_csv(input_file, nrows=0).columns:
                 raise ValueError("CSV must contain an 'email' column")
 
-            # Load existing progress if resuming
+            # Load existing progress if resuming, preferring the small checkpoint file
+            done_file = f"{output_file}.done"
+            has_output = resume and os.path.exists(output_file)
+            has_checkpoint = has_output and os.path.exists(done_file)
             processed_emails = set()
-            if resume and os.path.exists(output_file):
-                existing_df = pd.read_csv(output_file)
-                processed_emails = set(existing_df['email'].tolist())
-                self.results = [ManyChatData(**row) for _, row in existing_df.iterrows()]
+            if has_output:
+                if has_checkpoint:
+                    with open(done_file) as done_fp:
+                        processed_emails = set(done_fp.read().splitlines())
+                else:
+                    existing_emails = read_output_file(output_file, output_format, columns=['email'])['email']
+                    processed_emails = set(existing_emails.dropna().str.strip().str.lower())
                 log.info(f"Resuming from previous run. {len(processed_emails)} emails already processed")
-
-            # Filter out already processed emails
-            emails_to_process = [
-                email.strip().lower() for email in input_df['email'].tolist()
-                if email.strip().lower() not in processed_emails
-            ]
-
-            total_emails = len(emails_to_process)
-            log.info(f"Found {total_emails} emails to process")
             
-            # Process in batches of 10 emails
-            batch_size = 10
+            # Write rows as they complete instead of rewriting the whole file
+            log.info(f"Writing {output_format} output to {output_file}")
+            writer = CheckpointedResultWriter(
+                open_result_writer(output_file, output_format, append=resume),
+                done_file,
+                append=has_checkpoint,
+                seed=() if has_checkpoint else processed_emails
+            )
             
-            async with aiohttp.ClientSession() as session:
-                with Progress(
-                    SpinnerColumn(),
-                    *Progress.get_default_columns(),
-                    TimeElapsedColumn(),
-                    console=console
-                ) as progress:
-                    task = progress.add_task("Processing emails...", total=total_emails)
+            # Keep up to 10 requests in flight and flush CSV rows in groups of 256
+            max_concurrency = 10
+            flush_every = 256
+            chunk_size = 50_000
+            email_queue = asyncio.Queue(maxsize=max_concurrency * 100)
+            
+            with Progress(
+                SpinnerColumn(),
+                *Progress.get_default_columns(),
+                TimeElapsedColumn(),
+                console=console
+            ) as progress:
+                task = progress.add_task("Processing emails...", total=None)
+                
+                reader = pd.read_csv(input_file, usecols=['email'], dtype={'email': 'string'}, chunksize=chunk_size)
+                # One reader thread keeps chunk reads and the final close in order
+                read_executor = ThreadPoolExecutor(max_workers=1)
+                loop = asyncio.get_running_loop()
+                
+                def read_chunk() -> Optional[List[str]]:
+                    chunk = next(reader, None)
+                    if chunk is None:
+                        return None
+                    return chunk['email'].dropna().str.strip().str.lower().drop_duplicates().tolist()
+                
+                async def produce():
+                    # Stream the input so memory stays bounded by the chunk size,
+                    # parsing each chunk off the event loop
+                    total_emails = 0
+                    while (emails := await loop.run_in_executor(read_executor, read_chunk)) is not None:
+                        for email in emails:
+                            # Skip emails already written or queued earlier in the file
+                            if email in processed_emails:
+                                continue
+                            processed_emails.add(email)
+                            total_emails += 1
+                            progress.update(task, total=total_emails)
+                            await email_queue.put(email)
                     
-                    for i in range(0, total_emails, batch_size):
-                        batch = emails_to_process[i:i + batch_size]
-                        batch_results = await self.process_batch_async(session, batch)
+                    log.info(f"Found {total_emails} emails to process")
+                    for _ in range(max_concurrency):
+                        await email_queue.put(None)
+                
+                async def consume():
+                    while (email := await email_queue.get()) is not None:
+                        try:
+                            result = await self.fetch_manychat_data_async(self.session, email)
+                        except Exception as e:
+                            result = e
                         
-                        self.results.extend(batch_results)
-                        self.stats.total_processed += len(batch_results)
+                        # Tally outcomes in one place as results come back
+                        if isinstance(result, Exception):
+                            # Keep one full traceback per error type, not one per failed email
+                            error_type = type(result).__name__
+                            if error_type in self.seen_errors:
+                                log.error("❌ Error fetching data for %s: %s", email, result)
+                            else:
+                                self.seen_errors.add(error_type)
+                                log.error("❌ Error fetching data for %s: %s", email, result, exc_info=result)
+                            self.stats.failed += 1
+                            self.stats.errors.append((email, str(result)))
+                            result = ManyChatData(email=email, processed_at=self.now_iso)
+                        elif result is None:
+                            self.stats.empty_responses += 1
+                            result = ManyChatData(email=email, processed_at=self.now_iso)
+                        else:
+                            self.stats.successful += 1
                         
-                        # Save progress after each batch
-                        self.save_progress(self.results, output_file)
+                        writer.write(result.to_dict())
+                        self.stats.total_processed += 1
                         
-                        # Update progress
-                        progress.update(task, advance=len(batch))
+                        if self.stats.total_processed % flush_every == 0:
+                            writer.flush()
+                        
+                        progress.update(task, advance=1)
+                
+                tasks = [asyncio.create_task(produce())]
+                tasks += [asyncio.create_task(consume()) for _ in range(max_concurrency)]
+                try:
+                    await asyncio.gather(*tasks)
+                finally:
+                    for pending in tasks:
+                        pending.cancel()
+                    # Queued behind any read still parsing after its task was cancelled
+                    await loop.run_in_executor(read_executor, reader.close)
+                    read_executor.shutdown()
+            
+            writer.flush()
+            log.info(f"Progress saved to {output_file}")
             
             self.stats.end_time = datetime.now()
             log.info(f"Extraction completed at {self.stats.end_time}")
@@ -283,18 +622,38 @@ class ManyChatExtractor:
             self.stats.end_time = datetime.now()
             self.stats.print_summary()
             
-            # Save progress on error
-            if self.results:
-                error_output = f"error_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                self.save_progress(self.results, error_output)
-                log.info(f"Partial results saved to: {error_output}")
+            # Rows already written stay in the output file
+            if writer is not None:
+                writer.flush()
+                log.info(f"Partial results saved to: {output_file}")
             
             raise
+        
+        finally:
+            clock_task.cancel()
+            if writer is not None:
+                writer.close()
+
+def run_async(coro):
+    """Run a coroutine on uvloop when it is installed, else on the default loop"""
+    if uvloop is None:
+        return asyncio.run(coro)
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(coro)
+    uvloop.install()
+    return asyncio.run(coro)
+
+async def run_extraction(extractor: ManyChatExtractor, input_file: str, output_file: str, resume: bool) -> str:
+    """Run an extraction sharing the extractor's HTTP session"""
+    async with extractor:
+        return await extractor.process_csv_async(input_file, output_file, resume)
 
 def main():
     console.print("[bold blue]ManyChat Data Extractor[/bold blue]")
     console.print("=" * 50)
     
+    extractor = None
     try:
         # Get ManyChat API token from environment variable
         api_token = os.getenv('MANYCHAT_API_TOKEN')
@@ -310,11 +669,14 @@ def main():
             raise FileNotFoundError(f"Input file not found: {input_file}")
         
         # Ask about output file and generate default if needed
-        output_file = input("Enter the path to your output CSV file (or press Enter for auto-generated): ").strip()
+        output_file = input("Enter the path to your output file (.csv, .parquet or .feather, or press Enter for auto-generated): ").strip()
         if not output_file:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_file = f'manychat_data_{timestamp}.csv'
+            output_file = f'manychat_data_{timestamp}.parquet'
             console.print(f"Using auto-generated output file: {output_file}")
+        else:
+            # Reject unknown extensions before prompting any further
+            infer_output_format(output_file)
         
         # Create output directory if it doesn't exist
         output_dir = os.path.dirname(output_file)
@@ -327,7 +689,7 @@ def main():
             resume = input("Output file exists. Resume from previous run? (y/n): ").lower().startswith('y')
         
         # Process the file
-        output_file = asyncio.run(extractor.process_csv_async(input_file, output_file, resume))
+        output_file = run_async(run_extraction(extractor, input_file, output_file, resume))
         
         console.print(f"\n[bold green]✨ Output saved to:[/bold green] {output_file}")
         
@@ -335,6 +697,11 @@ def main():
         console.print(f"\n[bold red]ERROR:[/bold red] {str(e)}")
         log.error("Program terminated with error", exc_info=True)
         sys.exit(1)
+    
+    finally:
+        # Stop after the last log call so every record reaches the log file
+        if extractor is not None:
+            extractor.stop_logging()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file